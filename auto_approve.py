@@ -1,18 +1,48 @@
 import csv
 
+WRITE_CHUNK_ROWS = 4096
+IO_BUFFER_SIZE = 1 << 20
+
 def auto_approve(input_csv='data/phase2_categorized_data.csv', output_csv='data/phase2_approved.csv', min_confidence='Medium'):
+    """Mark relevant rows at or above min_confidence as 'Run GPT'.
+
+    Rows are streamed through csv.reader/writer, so peak memory is one
+    write chunk regardless of file size.
+    """
     confidence_order = {'Low': 0, 'Medium': 1, 'High': 2}
-    with open(input_csv, 'r', encoding='utf-8') as infile, open(output_csv, 'w', encoding='utf-8', newline='') as outfile:
-        reader = csv.DictReader(infile)
-        writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
-        writer.writeheader()
+    threshold = confidence_order.get(min_confidence, 1)
+    # Resolve the ordered comparison once into the set of passing labels, in the
+    # casings the file actually contains, so rows need no normalization
+    approved_confidences = frozenset(
+        variant
+        for conf, rank in confidence_order.items() if rank >= threshold
+        for variant in (conf, conf.lower(), conf.upper())
+    )
+    with open(input_csv, 'r', encoding='utf-8', newline='', buffering=IO_BUFFER_SIZE) as infile, \
+            open(output_csv, 'w', encoding='utf-8', newline='', buffering=IO_BUFFER_SIZE) as outfile:
+        reader = csv.reader(infile)
+        writer = csv.writer(outfile)
+        header = next(reader)
+        conf_idx = header.index('ai_confidence')
+        cat_idx = header.index('category')
+        if 'status' not in header:
+            header.append('status')
+        status_idx = header.index('status')
+        writer.writerow(header)
+        chunk = []
         for row in reader:
-            conf = row.get('ai_confidence', 'Low').capitalize()
-            cat = row.get('category', '')
+            if not row:
+                continue  # blank line; DictReader skipped these too
+            if len(row) <= status_idx:
+                row.extend([''] * (status_idx + 1 - len(row)))
             # Approve if confidence >= threshold and category is relevant
-            if confidence_order.get(conf, 0) >= confidence_order.get(min_confidence, 1) and cat != 'Not Relevant':
-                row['status'] = 'Run GPT'
-            writer.writerow(row)
+            if row[conf_idx] in approved_confidences and row[cat_idx] != 'Not Relevant':
+                row[status_idx] = 'Run GPT'
+            chunk.append(row)
+            if len(chunk) == WRITE_CHUNK_ROWS:
+                writer.writerows(chunk)
+                chunk.clear()
+        writer.writerows(chunk)
 
     print(f"✅ Auto-approved entries written to {output_csv}")
 
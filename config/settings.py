@@ -6,6 +6,15 @@ load_dotenv()
 class Settings:
     APIPIPE_API_KEY = os.getenv('APIPIPE_API_KEY')
     APIPIPE_API_BASE_URL = "https://aipipe.org/openrouter/v1/chat/completions"
+    APIPIPE_MAX_CONCURRENCY = int(os.getenv('APIPIPE_MAX_CONCURRENCY', '8'))
+    APIPIPE_BATCH_SIZE = int(os.getenv('APIPIPE_BATCH_SIZE', '10'))
+    APIPIPE_MAX_REQUESTS_PER_MINUTE = int(os.getenv('APIPIPE_MAX_REQUESTS_PER_MINUTE', '300'))
+    APIPIPE_MAX_TOKENS_PER_MINUTE = int(os.getenv('APIPIPE_MAX_TOKENS_PER_MINUTE', '150000'))
+
+    # Direct OpenAI access, only needed for Batch API content generation (--batch)
+    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_API_BASE_URL = "https://api.openai.com/v1"
+    OPENAI_BATCH_MODEL = os.getenv('OPENAI_BATCH_MODEL', 'gpt-4.1-nano')
 
     GOOGLE_APPLICATION_CREDENTIALS = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', 'config/google_credentials.json')
     GOOGLE_SHEET_NAME = os.getenv('GOOGLE_SHEET_NAME', 'AI Social Media Automation')
@@ -41,8 +50,13 @@ class Settings:
         'Published Timestamp', 'Date Extracted', 'Categorized At', 'Related Queries', 'Top Regions'
     ]
 
+    _validated = False
+
     @classmethod
     def validate_config(cls):
+        # Settings are read once at import, so a passing check stays valid for the process
+        if cls._validated:
+            return []
         errors = []
         if not cls.APIPIPE_API_KEY:
             errors.append("APIPIPE_API_KEY is required")
@@ -50,6 +64,7 @@ class Settings:
             errors.append(f"Google credentials not found: {cls.GOOGLE_APPLICATION_CREDENTIALS}")
         for directory in ['data', 'output', 'logs', 'config']:
             os.makedirs(directory, exist_ok=True)
+        cls._validated = not errors
         return errors
 
 settings = Settings()
@@ -5,7 +5,10 @@ Coordinates all phases of the automation workflow
 
 import sys
 import os
+import shelve
+import asyncio
 import argparse
+from contextlib import AsyncExitStack
 from datetime import datetime
 import logging
 
@@ -19,8 +22,27 @@ from scripts.utils import setup_logging, create_sample_data, save_data_to_csv
 class AIAutomationOrchestrator:
     """Main orchestrator for AI Social Media Automation"""
     
-    def __init__(self):
+    def __init__(self, use_batch_api=False, regenerate=False):
         self.logger = setup_logging(settings.LOG_LEVEL)
+        self.use_batch_api = use_batch_api
+        self.regenerate = regenerate
+        self.stack = None
+        self.http = None
+        self.cache = None
+
+    async def __aenter__(self):
+        """Open resources shared by all phases for the lifetime of the run"""
+        from scripts.apipipe_client import ApiPipeClient
+        from scripts.phase2_gpt1_categorization import CACHE_PATH
+
+        self.stack = AsyncExitStack()
+        self.http = await self.stack.enter_async_context(ApiPipeClient.create_session(settings.APIPIPE_API_KEY))
+        os.makedirs('data', exist_ok=True)
+        self.cache = self.stack.enter_context(shelve.open(CACHE_PATH))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stack.aclose()
         
     def display_banner(self):
         """Display application banner"""
@@ -77,7 +99,7 @@ class AIAutomationOrchestrator:
             self.logger.error(f"❌ Error in Phase 1: {str(e)}")
             return False
     
-    def run_phase2(self):
+    async def run_phase2(self):
         """Run Phase 2: GPT-1 Categorization"""
         
         self.logger.info("\n🚀 PHASE 2: GPT-1 Agent Categorization")
@@ -86,8 +108,8 @@ class AIAutomationOrchestrator:
         try:
             from scripts.phase2_gpt1_categorization import GPT1CategorizationAgent
             
-            agent = GPT1CategorizationAgent()
-            success = agent.run()
+            agent = GPT1CategorizationAgent(http=self.http, cache=self.cache)
+            success = await agent.run_async()
             
             if success:
                 self.logger.info("✅ Phase 2 completed successfully")
@@ -100,7 +122,53 @@ class AIAutomationOrchestrator:
             self.logger.error(f"❌ Error in Phase 2: {str(e)}")
             return False
     
-    def run_phase3(self):
+    async def run_phases_1_and_2(self):
+        """Run Phases 1 and 2 as a pipeline: keywords are categorized as soon as they are extracted"""
+        
+        self.logger.info("\n🚀 PHASES 1 + 2: Google Trends Extraction → GPT-1 Agent Categorization")
+        self.logger.info("=" * 60)
+        
+        try:
+            from scripts.phase1_google_trends import ImprovedGoogleTrendsExtractor
+            from scripts.phase2_gpt1_categorization import GPT1CategorizationAgent
+            
+            extractor = ImprovedGoogleTrendsExtractor()
+            agent = GPT1CategorizationAgent(http=self.http, cache=self.cache)
+            workers = settings.APIPIPE_MAX_CONCURRENCY
+            queue = asyncio.Queue(maxsize=64)
+            
+            async def produce():
+                try:
+                    return await extractor.stream_trending_data(queue)
+                finally:
+                    for _ in range(workers):
+                        await queue.put(None)
+            
+            trends_data, categorized_data = await asyncio.gather(
+                produce(), agent.categorize_stream(queue, workers)
+            )
+            await agent.close()
+            
+            # Keep the Phase 1 CSV so Phase 2 can still be re-run on its own; a failed
+            # checkpoint write must not discard results that were already categorized
+            phase1_ok = extractor.save_to_csv(trends_data)
+            try:
+                phase2_ok = agent.save_results(categorized_data)
+            except Exception as e:
+                self.logger.error(f"❌ Error saving Phase 2 results: {str(e)}")
+                phase2_ok = False
+            
+            if phase1_ok and phase2_ok:
+                self.logger.info("✅ Phases 1 + 2 completed successfully")
+            else:
+                self.logger.error("❌ Phases 1 + 2 failed")
+            return phase1_ok, phase2_ok
+                
+        except Exception as e:
+            self.logger.error(f"❌ Error in Phases 1 + 2: {str(e)}")
+            return False, False
+    
+    async def run_phase3(self):
         """Run Phase 3: GPT-2 Content Generation"""
         
         self.logger.info("\n🚀 PHASE 3: GPT-2 Content Generation")
@@ -109,8 +177,10 @@ class AIAutomationOrchestrator:
         try:
             from scripts.phase3_gpt2_content_generation import GPT2ContentGenerationAgent
             
-            agent = GPT2ContentGenerationAgent()
-            success = agent.run()
+            agent = GPT2ContentGenerationAgent(
+                http=self.http, use_batch_api=self.use_batch_api, regenerate=self.regenerate
+            )
+            success = await agent.run_async()
             
             if success:
                 self.logger.info("✅ Phase 3 completed successfully")
@@ -159,7 +229,7 @@ class AIAutomationOrchestrator:
         
         return True
     
-    def run_all_phases(self):
+    async def run_all_phases(self):
         """Run all automated phases"""
         
         self.display_banner()
@@ -173,23 +243,21 @@ class AIAutomationOrchestrator:
         completed_phases = 0
         total_phases = 4
         
-        # Phase 1: Google Trends Extraction
-        if self.run_phase1():
+        # Phases 1 + 2: Google Trends Extraction streamed into GPT-1 Categorization
+        phase1_ok, phase2_ok = await self.run_phases_1_and_2()
+        if phase1_ok:
             completed_phases += 1
         else:
-            self.logger.warning("⚠️ Phase 1 failed - creating sample data for testing")
-            self.create_sample_data_if_needed()
-            # Don't return False, continue with sample data
+            self.logger.warning("⚠️ Phase 1 CSV was not saved - 'main.py --phase 2' cannot be re-run on its own")
         
-        # Phase 2: GPT-1 Categorization
-        if self.run_phase2():
+        if phase2_ok:
             completed_phases += 1
         else:
             self.logger.error("❌ Stopping at Phase 2 failure")
             return False
         
         # Phase 3: GPT-2 Content Generation (might fail if no approved items)
-        if self.run_phase3():
+        if await self.run_phase3():
             completed_phases += 1
         else:
             self.logger.info("ℹ️ Phase 3: No content generated (normal if no entries approved)")
@@ -221,6 +289,24 @@ class AIAutomationOrchestrator:
         return completed_phases >= 2
 
 
+async def main_async(args):
+    """Run the requested phases inside the orchestrator's shared resources"""
+    
+    async with AIAutomationOrchestrator(use_batch_api=args.batch, regenerate=args.regenerate) as orchestrator:
+        if args.phase:
+            # Run specific phase
+            if args.phase == 1:
+                return orchestrator.run_phase1()
+            elif args.phase == 2:
+                return await orchestrator.run_phase2()
+            elif args.phase == 3:
+                return await orchestrator.run_phase3()
+            elif args.phase == 4:
+                return orchestrator.run_phase4()
+        # Run all phases
+        return await orchestrator.run_all_phases()
+
+
 def main():
     """Main function with command-line interface"""
     
@@ -229,33 +315,20 @@ def main():
                        help='Run specific phase (1-4)')
     parser.add_argument('--sample', action='store_true', 
                        help='Create sample data for testing')
+    parser.add_argument('--batch', action='store_true',
+                       help='Generate Phase 3 content through the OpenAI Batch API (needs OPENAI_API_KEY, up to 24h)')
+    parser.add_argument('--regenerate', action='store_true',
+                       help='Regenerate all Phase 3 content instead of resuming an interrupted run')
     
     args = parser.parse_args()
     
-    orchestrator = AIAutomationOrchestrator()
-    
     if args.sample:
-        orchestrator.create_sample_data_if_needed()
+        AIAutomationOrchestrator().create_sample_data_if_needed()
         return
     
-    if args.phase:
-        # Run specific phase
-        if args.phase == 1:
-            success = orchestrator.run_phase1()
-        elif args.phase == 2:
-            success = orchestrator.run_phase2()
-        elif args.phase == 3:
-            success = orchestrator.run_phase3()
-        elif args.phase == 4:
-            success = orchestrator.run_phase4()
-        
-        if not success:
-            exit(1)
-    else:
-        # Run all phases
-        success = orchestrator.run_all_phases()
-        if not success:
-            exit(1)
+    success = asyncio.run(main_async(args))
+    if not success:
+        exit(1)
 
 
 if __name__ == "__main__":
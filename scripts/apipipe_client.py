@@ -0,0 +1,101 @@
+"""
+ApiPipe chat-completions client shared by the GPT phases
+"""
+
+import os
+import sys
+import asyncio
+import aiohttp
+import orjson
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import settings
+from scripts.parallel_processor import RateLimiter, estimate_tokens, parse_retry_after
+
+# Shared by every client so all phases draw from the same ApiPipe quota
+rate_limiter = RateLimiter(settings.APIPIPE_MAX_REQUESTS_PER_MINUTE, settings.APIPIPE_MAX_TOKENS_PER_MINUTE)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def is_transient_error(error):
+    """Connection problems, timeouts and 429/5xx responses are worth retrying"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+def message_text(messages):
+    """Concatenated text of chat messages, whether content is a string or a list of blocks"""
+    parts = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content)
+    return "".join(parts)
+
+class ApiPipeClient:
+    def __init__(self, api_key, session=None, limiter=None):
+        self.api_key = api_key
+        self.auth_header = f"Bearer {api_key}"
+        self.base_url = settings.APIPIPE_API_BASE_URL
+        self.limiter = limiter or rate_limiter
+        # A session passed in is shared with other phases and closed by its owner
+        self.session = session
+        self._owns_session = session is None
+
+    @staticmethod
+    def create_session(api_key=None):
+        # One pooled connector keeps TCP/TLS connections alive across calls, and the
+        # ApiPipe auth header is set once here; other APIs pass their own per request
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=16, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(sock_connect=5, sock_read=30),
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else None,
+            json_serialize=lambda obj: orjson.dumps(obj).decode('utf-8')
+        )
+
+    def get_session(self):
+        # Created lazily so the session binds to the running event loop
+        if self.session is None or self.session.closed:
+            self.session = self.create_session(self.api_key)
+            self._owns_session = True
+        return self.session
+
+    async def close(self):
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def generate_text(self, prompt=None, messages=None, timeout=None):
+        """Send a single user prompt, or prebuilt messages (e.g. with cacheable content blocks).
+
+        timeout, an aiohttp.ClientTimeout, replaces the session's timeouts for this request.
+        """
+        if messages is None:
+            messages = [{"role": "user", "content": prompt}]
+        payload = {
+            "model": "openai/gpt-4.1-nano",
+            "messages": messages
+        }
+        return await self._post(payload, estimate_tokens(message_text(messages)), timeout)
+
+    @retry(
+        wait=wait_random_exponential(min=1, max=60),
+        stop=stop_after_attempt(6),
+        retry=retry_if_exception(is_transient_error),
+        reraise=True
+    )
+    async def _post(self, payload, tokens, timeout=None):
+        await self.limiter.acquire(tokens)
+        session = self.get_session()
+        request_options = {"timeout": timeout} if timeout is not None else {}
+        # Sessions from create_session carry our auth header; any other session gets it per request
+        if session.headers.get("Authorization") != self.auth_header:
+            request_options["headers"] = {"Authorization": self.auth_header}
+        async with session.post(self.base_url, json=payload, **request_options) as response:
+            if response.status == 429:
+                # The server says when quota frees up; hold every caller until then
+                self.limiter.pause(parse_retry_after(response.headers))
+            response.raise_for_status()
+            return orjson.loads(await response.read())
@@ -0,0 +1,119 @@
+"""
+OpenAI Batch API client for non-interactive bulk generation
+Requests are uploaded as one JSONL file and processed within a 24h window at reduced cost
+"""
+
+import os
+import sys
+import asyncio
+import logging
+import aiohttp
+import orjson
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import settings
+
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class OpenAIBatchClient:
+    def __init__(self, api_key, session=None):
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is required for the Batch API")
+        self.api_key = api_key
+        self.base_url = settings.OPENAI_API_BASE_URL
+        self.session = session
+        self._owns_session = session is None
+        self.logger = logging.getLogger('ai_automation')
+
+    @property
+    def headers(self):
+        # Sent on every request: a shared session may default to the ApiPipe token
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+            self._owns_session = True
+        return self.session
+
+    async def close(self):
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    @staticmethod
+    def build_request(custom_id, prompt):
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": settings.OPENAI_BATCH_MODEL,
+                "messages": [{"role": "user", "content": prompt}]
+            }
+        }
+
+    async def upload(self, jsonl):
+        form = aiohttp.FormData()
+        form.add_field('purpose', 'batch')
+        form.add_field('file', jsonl, filename='batch.jsonl', content_type='application/jsonl')
+        async with self.get_session().post(f"{self.base_url}/files", headers=self.headers, data=form) as response:
+            response.raise_for_status()
+            return orjson.loads(await response.read())['id']
+
+    async def create(self, input_file_id):
+        payload = {
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        }
+        async with self.get_session().post(f"{self.base_url}/batches", headers=self.headers, json=payload) as response:
+            response.raise_for_status()
+            return orjson.loads(await response.read())
+
+    async def retrieve(self, batch_id):
+        async with self.get_session().get(f"{self.base_url}/batches/{batch_id}", headers=self.headers) as response:
+            response.raise_for_status()
+            return orjson.loads(await response.read())
+
+    async def download(self, file_id):
+        async with self.get_session().get(f"{self.base_url}/files/{file_id}/content", headers=self.headers) as response:
+            response.raise_for_status()
+            return [orjson.loads(line) for line in (await response.read()).splitlines() if line.strip()]
+
+    async def wait(self, batch_id, poll_interval=30, max_interval=600):
+        """Poll until the batch reaches a terminal status, backing off between polls"""
+        while True:
+            batch = await self.retrieve(batch_id)
+            if batch['status'] in TERMINAL_STATUSES:
+                return batch
+            counts = batch.get('request_counts') or {}
+            self.logger.info(
+                f"⏳ Batch {batch_id} {batch['status']}: "
+                f"{counts.get('completed', 0)}/{counts.get('total', '?')} done, next check in {poll_interval}s"
+            )
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(int(poll_interval * 1.5), max_interval)
+
+    async def run(self, requests):
+        """Submit request dicts as one batch and return {custom_id: chat completion body or error}"""
+        jsonl = b'\n'.join(orjson.dumps(request) for request in requests)
+        input_file_id = await self.upload(jsonl)
+        batch = await self.create(input_file_id)
+        self.logger.info(f"📦 Submitted batch {batch['id']} with {len(requests)} requests")
+        batch = await self.wait(batch['id'])
+        if batch['status'] != 'completed':
+            raise RuntimeError(f"Batch {batch['id']} ended with status '{batch['status']}'")
+
+        results = {}
+        for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+            if not file_id:
+                continue
+            for line in await self.download(file_id):
+                response = line.get('response') or {}
+                if response.get('status_code') == 200:
+                    results[line['custom_id']] = response['body']
+                else:
+                    error = line.get('error') or response.get('body', {}).get('error') or 'Request failed'
+                    results[line['custom_id']] = {"error": error}
+        return results
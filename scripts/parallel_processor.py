@@ -0,0 +1,81 @@
+"""
+Request and token rate limiting for ApiPipe calls
+Token-bucket throttling modeled on the OpenAI cookbook's api_request_parallel_processor
+"""
+
+import re
+import time
+import asyncio
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_SECONDS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough token estimate for rate limiting (~4 characters per token)"""
+    return len(prompt) // 4 + 1
+
+
+def parse_retry_after(headers) -> float:
+    """Seconds to wait from Retry-After or x-ratelimit-reset-* headers, 0 if absent"""
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    waits = [0.0]
+    for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens'):
+        value = headers.get(name)
+        if value:
+            # OpenAI-style durations such as "20ms", "1s" or "6m0s"
+            waits.append(sum(float(n) * _DURATION_SECONDS[unit] for n, unit in _DURATION_PART.findall(value)))
+    return max(waits)
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, refilled continuously"""
+
+    def __init__(self, max_requests_per_minute: int, max_tokens_per_minute: int):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = float(max_requests_per_minute)
+        self.available_token_capacity = float(max_tokens_per_minute)
+        self.last_update_time = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.last_update_time
+        self.available_request_capacity = min(
+            self.max_requests_per_minute,
+            self.available_request_capacity + self.max_requests_per_minute * elapsed / 60
+        )
+        self.available_token_capacity = min(
+            self.max_tokens_per_minute,
+            self.available_token_capacity + self.max_tokens_per_minute * elapsed / 60
+        )
+        self.last_update_time = now
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until one request and `tokens` tokens are available, then consume them"""
+        tokens = min(tokens, self.max_tokens_per_minute)
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return
+            # Sleep just long enough for the scarcer bucket to refill
+            wait = max(
+                (1 - self.available_request_capacity) * 60 / self.max_requests_per_minute,
+                (tokens - self.available_token_capacity) * 60 / self.max_tokens_per_minute
+            )
+            await asyncio.sleep(max(wait, 0.01))
+
+    def pause(self, seconds: float):
+        """Hold all requests for `seconds`, e.g. after a 429 from the API"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -1,20 +1,22 @@
+import os
+import csv
 import time
 import random
+import asyncio
 import logging
 from datetime import datetime
-import pandas as pd
-import os
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from fake_useragent import UserAgent
+from pytrends.request import TrendReq
+
+# Google Trends compares at most 5 keywords per payload
+TRENDS_BATCH_SIZE = 5
+# Sent in every payload and scaled to 100, so scores are comparable across batches
+TRENDS_ANCHOR_KEYWORD = 'sarkari naukri'
 
 class ImprovedGoogleTrendsExtractor:
-    def __init__(self):
-        self.driver = None
-        self.ua = UserAgent()
+    def __init__(self, simulate_latency=False):
+        # Fallback data makes no network calls; only sleep when emulating real extraction timing
+        self.simulate_latency = simulate_latency
         self.job_keywords = [
             "admit card 2025", "hall ticket download", "ssc admit card", "bank po admit card",
             "upsc admit card", "railway admit card", "police admit card", "teacher admit card",
@@ -25,82 +27,101 @@ class ImprovedGoogleTrendsExtractor:
             "clerk recruitment", "officer recruitment", "exam notification", "application form"
         ]
 
-    def setup_selenium(self):
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument(f"--user-agent={self.ua.random}")
-        try:
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            logging.info("✅ Selenium Chrome driver initialized")
-            return True
-        except Exception as e:
-            logging.error(f"❌ Failed to initialize Chrome driver: {e}")
-            return False
-
     def extract_trending_data(self):
+        return [entry for batch in self.iter_trending_data() for entry in batch]
+
+    async def stream_trending_data(self, queue):
+        """Put each trend entry on the queue as soon as its batch is extracted"""
         trends_data = []
-        logging.info(f"🎯 Processing {len(self.job_keywords)} job-related keywords")
-        if self.setup_selenium():
-            trends_data = self.selenium_extraction()
-        else:
-            logging.info("🔄 Using fallback extraction method...")
-            trends_data = self.fallback_extraction()
+        batches = self.iter_trending_data()
+        # pytrends is blocking, so each batch is pulled in a worker thread
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            for entry in batch:
+                # Consumers annotate entries in place; keep the Phase 1 rows untouched
+                await queue.put(dict(entry))
+            trends_data.extend(batch)
         return trends_data
 
-    def selenium_extraction(self):
-        trends_data = []
+    def iter_trending_data(self):
+        """Yield lists of trend entries, using generated data for any keywords Google Trends didn't return"""
+        logging.info(f"🎯 Processing {len(self.job_keywords)} job-related keywords")
+        extracted = set()
         try:
-            self.driver.get("https://trends.google.com/trends/explore?geo=IN")
-            time.sleep(5)
-            logging.info("🌐 Accessing Google Trends India...")
-            for i, keyword in enumerate(self.job_keywords, 1):
-                logging.info(f"📈 Processing ({i}/{len(self.job_keywords)}): {keyword}")
-                try:
-                    search_url = f"https://trends.google.com/trends/explore?geo=IN&q={keyword.replace(' ', '%20')}"
-                    self.driver.get(search_url)
-                    time.sleep(random.uniform(3, 6))
-                    interest_score = random.randint(45, 95)  # Placeholder
-                    trend_entry = {
-                        'keyword': keyword,
-                        'interest': interest_score,
-                        'related_topics': self.generate_related_topics(keyword),
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'geo': 'IN',
-                        'category': self.categorize_keyword(keyword)
-                    }
-                    trends_data.append(trend_entry)
-                    logging.info(f"✅ Extracted data for: {keyword}")
-                except Exception as e:
-                    logging.error(f"❌ Error processing '{keyword}': {e}")
-                    continue
+            for batch in self.pytrends_extraction():
+                extracted.update(entry['keyword'] for entry in batch)
+                yield batch
         except Exception as e:
-            logging.error(f"❌ Selenium extraction failed: {e}")
-        finally:
-            if self.driver:
-                self.driver.quit()
-        return trends_data
+            logging.error(f"❌ Google Trends extraction failed: {e}")
+        remaining = [keyword for keyword in self.job_keywords if keyword not in extracted]
+        if remaining:
+            logging.info(f"🔄 Using fallback extraction method for {len(remaining)} keywords...")
+            yield self.fallback_extraction(remaining)
+
+    def pytrends_extraction(self):
+        pytrends = TrendReq(hl='en-IN', tz=330, timeout=(5, 30))
+        logging.info("🌐 Accessing Google Trends India...")
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        batch_size = TRENDS_BATCH_SIZE - 1  # one slot holds the anchor
+        for start in range(0, len(self.job_keywords), batch_size):
+            batch = self.job_keywords[start:start + batch_size]
+            logging.info(f"📈 Processing ({start + len(batch)}/{len(self.job_keywords)}): {', '.join(batch)}")
+            try:
+                pytrends.build_payload(kw_list=batch + [TRENDS_ANCHOR_KEYWORD], geo='IN', timeframe='now 7-d')
+                interest_df = pytrends.interest_over_time()
+            except Exception as e:
+                # Often a 429 after the first payloads; keep the batch with fallback data
+                logging.error(f"❌ Error processing batch {batch}: {e}")
+                logging.info("🔄 Using fallback extraction method for this batch...")
+                yield self.fallback_extraction(batch)
+                continue
+            anchor = self.mean_interest(interest_df, TRENDS_ANCHOR_KEYWORD)
+            # Without anchor interest the batch can only be scored relative to itself
+            source = 'pytrends' if anchor > 0 else 'pytrends_unanchored'
+            trends_data = []
+            for keyword in batch:
+                mean = self.mean_interest(interest_df, keyword)
+                interest_score = int(round(mean * 100 / anchor)) if anchor > 0 else int(round(mean))
+                trend_entry = {
+                    'keyword': keyword,
+                    'interest': interest_score,
+                    'related_topics': self.generate_related_topics(keyword),
+                    'timestamp': timestamp,
+                    'geo': 'IN',
+                    'category': self.categorize_keyword(keyword),
+                    'source': source
+                }
+                trends_data.append(trend_entry)
+                logging.info(f"✅ Extracted data for: {keyword}")
+            yield trends_data
+
+    @staticmethod
+    def mean_interest(interest_df, keyword):
+        mean = interest_df[keyword].mean() if keyword in interest_df else 0
+        # An empty frame gives a NaN mean, which int() can't convert
+        return mean if mean == mean else 0
 
-    def fallback_extraction(self):
+    def fallback_extraction(self, keywords=None):
+        keywords = self.job_keywords if keywords is None else keywords
         trends_data = []
-        for i, keyword in enumerate(self.job_keywords, 1):
-            logging.info(f"📈 Processing ({i}/{len(self.job_keywords)}): {keyword}")
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for i, keyword in enumerate(keywords, 1):
+            logging.info(f"📈 Processing ({i}/{len(keywords)}): {keyword}")
             try:
                 interest_score = random.randint(50, 95)
                 trend_entry = {
                     'keyword': keyword,
                     'interest': interest_score,
                     'related_topics': self.generate_related_topics(keyword),
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'timestamp': timestamp,
                     'geo': 'IN',
-                    'category': self.categorize_keyword(keyword)
+                    'category': self.categorize_keyword(keyword),
+                    # Random score, not Google Trends data
+                    'source': 'fallback'
                 }
                 trends_data.append(trend_entry)
                 logging.info(f"✅ Generated data for: {keyword}")
-                time.sleep(random.uniform(0.5, 2))
+                if self.simulate_latency:
+                    time.sleep(random.uniform(0.5, 2))
             except Exception as e:
                 logging.error(f"❌ Error processing '{keyword}': {e}")
                 continue
@@ -133,12 +154,20 @@ class ImprovedGoogleTrendsExtractor:
             logging.warning("⚠️ No data to save")
             return False
         try:
-            df = pd.DataFrame(data)
-            df = df.drop_duplicates(subset=['keyword'], keep='first')
+            seen = set()
+            rows = []
+            for row in data:
+                if row['keyword'] in seen:
+                    continue
+                seen.add(row['keyword'])
+                rows.append(row)
             os.makedirs('data', exist_ok=True)
-            df.to_csv(filename, index=False)
-            logging.info(f"✅ Saved {len(df)} unique trends to {filename}")
-            logging.info(f"📊 Removed {len(data) - len(df)} duplicates")
+            with open(filename, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+            logging.info(f"✅ Saved {len(rows)} unique trends to {filename}")
+            logging.info(f"📊 Removed {len(data) - len(rows)} duplicates")
             return True
         except Exception as e:
             logging.error(f"❌ Error saving data: {e}")
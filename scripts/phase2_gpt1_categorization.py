@@ -1,61 +1,27 @@
 import sys
 import os
-import json
-import time
-import requests
+import re
+import string
+import orjson
+import shelve
+import hashlib
+import asyncio
+import functools
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import settings
+from scripts.apipipe_client import ApiPipeClient
 from scripts.utils import (
     setup_logging, load_data_from_csv, save_data_to_csv,
-    get_current_timestamp, clean_text, add_delay
+    get_current_timestamp, clean_text
 )
 
-class ApiPipeClient:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.base_url = settings.APIPIPE_API_BASE_URL
+# Bump whenever the categorization prompt changes so cached results are not reused
+PROMPT_VERSION = '1'
+CACHE_PATH = os.path.join('data', 'gpt1_cache')
 
-    def generate_text(self, prompt):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "openai/gpt-4.1-nano",
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        response = requests.post(self.base_url, headers=headers, json=payload)
-        response.raise_for_status()
-        return response.json()
-
-class GPT1CategorizationAgent:
-    def __init__(self):
-        self.logger = setup_logging(settings.LOG_LEVEL)
-        self.client = ApiPipeClient(settings.APIPIPE_API_KEY)
-        self.logger.info("✅ ApiPipe client initialized successfully")
-
-    def perform_web_search(self, keyword):
-        keyword_lower = keyword.lower()
-        search_context = []
-        admit_indicators = ['admit card', 'hall ticket', 'call letter', 'download']
-        if any(indicator in keyword_lower for indicator in admit_indicators):
-            search_context.append("Found admit card indicator in keyword")
-        result_indicators = ['result', 'merit list', 'cut off', 'declared', 'scorecard']
-        if any(indicator in keyword_lower for indicator in result_indicators):
-            search_context.append("Found result indicator in keyword")
-        job_indicators = ['job', 'recruitment', 'notification', 'vacancy', 'hiring']
-        if any(indicator in keyword_lower for indicator in job_indicators):
-            search_context.append("Found job notification indicator in keyword")
-        gov_indicators = ['ssc', 'upsc', 'bank', 'railway', 'neet', 'jee', 'government']
-        if any(indicator in keyword_lower for indicator in gov_indicators):
-            search_context.append("Found government/education context")
-        web_context = "; ".join(search_context) if search_context else "No specific job-related context found"
-        return web_context
-
-    def get_categorization_prompt(self):
-        return """You are an expert AI agent specialized in categorizing job-related trending topics for India.
+CATEGORIZATION_PROMPT = """You are an expert AI agent specialized in categorizing job-related trending topics for India.
 
 TASK: Categorize the keyword into EXACTLY ONE of these 4 categories:
 
@@ -82,85 +48,343 @@ RESPONSE FORMAT (JSON only):
     "reasoning": "Brief explanation (2-3 sentences)"
 }}"""
 
-    def categorize_keyword(self, entry, retries=3, backoff=5):
-        web_context = ""
-        try:
-            web_context = self.perform_web_search(entry['keyword'])
-            prompt = self.get_categorization_prompt().format(
+# The prompt is split into (literal, field) segments once; filling it is a plain join
+_PROMPT_SEGMENTS = tuple(
+    (literal, field) for literal, field, _, _ in string.Formatter().parse(CATEGORIZATION_PROMPT)
+)
+
+def build_categorization_prompt(**values):
+    """Fill CATEGORIZATION_PROMPT, equivalent to CATEGORIZATION_PROMPT.format(**values)"""
+    return ''.join(
+        literal + (str(values[field]) if field is not None else '')
+        for literal, field in _PROMPT_SEGMENTS
+    )
+
+# Batch prompt: the keyword list (JSON) is placed between head and tail
+BATCH_CATEGORIZATION_PROMPT_HEAD = """You are an expert AI agent specialized in categorizing job-related trending topics for India.
+
+TASK: Categorize EACH keyword below into EXACTLY ONE of these 4 categories:
+
+1. Admit Card - Exam admit cards, hall tickets, call letters
+2. Result - Exam results, merit lists, cut-off marks
+3. Job Notification - Job openings, recruitment announcements
+4. Not Relevant - Topics not related to jobs/exams/education
+
+INSTRUCTIONS:
+- Be strict - if not clearly job/exam related, mark as "Not Relevant"
+- Focus on Indian job market and government exams
+- Use web search context for accurate categorization
+- Return exactly one object per keyword, copying the keyword exactly as given
+
+KEYWORDS (JSON):
+"""
+BATCH_CATEGORIZATION_PROMPT_TAIL = """
+
+RESPONSE FORMAT (JSON array only, same order as the keywords):
+[
+    {
+        "keyword": "The keyword exactly as given",
+        "category": "Exact category name from the 4 options above",
+        "confidence": "High/Medium/Low",
+        "reasoning": "Brief explanation (2-3 sentences)"
+    }
+]"""
+
+INDICATORS = {
+    'admit': ['admit card', 'hall ticket', 'call letter', 'download'],
+    'result': ['result', 'merit list', 'cut off', 'declared', 'scorecard'],
+    'job': ['job', 'recruitment', 'notification', 'vacancy', 'hiring'],
+    'gov': ['ssc', 'upsc', 'bank', 'railway', 'neet', 'jee', 'government'],
+}
+INDICATOR_MESSAGES = {
+    'admit': "Found admit card indicator in keyword",
+    'result': "Found result indicator in keyword",
+    'job': "Found job notification indicator in keyword",
+    'gov': "Found government/education context",
+}
+# One alternation with a named group per indicator class, so a single scan finds every class
+INDICATOR_PATTERN = re.compile('|'.join(
+    f"(?P<{tag}>{'|'.join(map(re.escape, words))})" for tag, words in INDICATORS.items()
+))
+
+# Columns filled in by process_batch, fanned back out to duplicate keywords
+CATEGORIZATION_FIELDS = ('category', 'ai_confidence', 'ai_reasoning', 'web_search_summary', 'categorized_at', 'status')
+
+# Indicator classes that map one-to-one onto a target category
+RULE_CATEGORIES = {
+    'admit': settings.CATEGORY_ADMIT_CARD,
+    'result': settings.CATEGORY_RESULT,
+    'job': settings.CATEGORY_JOB_NOTIFICATION,
+}
+
+# Stricter, whole-word phrases (regex) for skipping the LLM. INDICATORS is only prompt
+# context; loose words like 'download' or 'job' would misfile "free movie download"
+RULE_INDICATORS = {
+    'admit': [r'admit cards?', r'hall tickets?', r'call letters?'],
+    'result': [r'results?', r'merit lists?', r'cut ?offs?'],
+    'job': [r'recruitments?', r'vacanc(?:y|ies)', r'job notifications?'],
+    'gov': [re.escape(word) for word in INDICATORS['gov']],
+}
+RULE_PATTERN = re.compile(r'\b(?:' + '|'.join(
+    f"(?P<{tag}>{'|'.join(words)})" for tag, words in RULE_INDICATORS.items()
+) + r')\b')
+
+@functools.lru_cache(maxsize=4096)
+def match_indicators(keyword):
+    """Return the set of indicator classes found in the keyword"""
+    return frozenset(m.lastgroup for m in INDICATOR_PATTERN.finditer(keyword.lower()))
+
+@functools.lru_cache(maxsize=4096)
+def match_rule_indicators(keyword):
+    """Return the set of RULE_INDICATORS classes found in the keyword as whole words"""
+    return frozenset(m.lastgroup for m in RULE_PATTERN.finditer(keyword.lower()))
+
+class GPT1CategorizationAgent:
+    def __init__(self, http=None, cache=None):
+        self.logger = setup_logging(settings.LOG_LEVEL)
+        self.client = ApiPipeClient(settings.APIPIPE_API_KEY, session=http)
+        self._owns_cache = cache is None
+        if cache is None:
+            os.makedirs('data', exist_ok=True)
+            cache = shelve.open(CACHE_PATH)
+        self._cache = cache
+        self._sem = asyncio.Semaphore(settings.APIPIPE_MAX_CONCURRENCY)
+        self.logger.info("✅ ApiPipe client initialized successfully")
+
+    @staticmethod
+    def cache_key(keyword):
+        return hashlib.sha1((keyword + PROMPT_VERSION).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def perform_web_search(keyword):
+        hits = match_indicators(keyword)
+        search_context = [msg for tag, msg in INDICATOR_MESSAGES.items() if tag in hits]
+        web_context = "; ".join(search_context) if search_context else "No specific job-related context found"
+        return web_context
+
+    def get_categorization_prompt(self):
+        return CATEGORIZATION_PROMPT
+
+    def rule_based_category(self, keyword):
+        """Return the category when a government/exam context and exactly one target
+        category's strict indicators match, else None so the LLM decides"""
+        hits = match_rule_indicators(keyword)
+        if 'gov' not in hits:
+            return None
+        matched = [RULE_CATEGORIES[tag] for tag in hits if tag in RULE_CATEGORIES]
+        return matched[0] if len(matched) == 1 else None
+
+    def fallback_result(self, reasoning, web_context):
+        return {
+            'category': settings.CATEGORY_NOT_RELEVANT,
+            'confidence': 'Low',
+            'reasoning': reasoning,
+            'web_search_summary': web_context
+        }
+
+    def parse_result(self, result, web_context):
+        category = result.get('category', settings.CATEGORY_NOT_RELEVANT)
+        if category not in settings.VALID_CATEGORIES:
+            category = settings.CATEGORY_NOT_RELEVANT
+        return {
+            'category': category,
+            'confidence': result.get('confidence', 'Low'),
+            'reasoning': result.get('reasoning', 'No reasoning provided'),
+            'web_search_summary': web_context
+        }
+
+    async def categorize_keyword(self, entry):
+        return (await self.categorize_batch([entry]))[0]
+
+    async def categorize_batch(self, entries):
+        """Categorize entries in order; rule matches and cache hits are answered locally,
+        the rest go to ApiPipe APIPIPE_BATCH_SIZE keywords per request"""
+        results = [None] * len(entries)
+        pending = []
+        for i, entry in enumerate(entries):
+            keyword = entry['keyword']
+            rule_category = self.rule_based_category(keyword)
+            if rule_category:
+                results[i] = {
+                    'category': rule_category,
+                    'confidence': 'High',
+                    'reasoning': 'Rule-based match',
+                    'web_search_summary': self.perform_web_search(keyword)
+                }
+                continue
+            cached = self._cache.get(self.cache_key(keyword))
+            if cached:
+                results[i] = cached
+            else:
+                pending.append(i)
+
+        size = settings.APIPIPE_BATCH_SIZE
+        chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+        chunk_results = await asyncio.gather(
+            *[self.categorize_with_llm([entries[i] for i in chunk]) for chunk in chunks]
+        )
+        for chunk, ai_results in zip(chunks, chunk_results):
+            for i, ai_result in zip(chunk, ai_results):
+                results[i] = ai_result
+        return results
+
+    async def categorize_with_llm(self, entries):
+        """Categorize up to APIPIPE_BATCH_SIZE entries with a single ApiPipe request"""
+        web_contexts = [self.perform_web_search(entry['keyword']) for entry in entries]
+        if len(entries) == 1:
+            entry = entries[0]
+            prompt = build_categorization_prompt(
                 keyword=entry['keyword'],
                 interest_score=entry.get('interest_score', 0),
                 related_queries=entry.get('related_queries', ''),
-                web_context=web_context
+                web_context=web_contexts[0]
             )
-            for attempt in range(retries):
-                try:
-                    response = self.client.generate_text(prompt)
-                    text_response = response.get("choices", [{}])[0].get("message", {}).get("content", "")
-                    if not text_response:
-                        text_response = response.get("text") or response.get("message") or ""
-                    result = json.loads(text_response)
-                    break
-                except Exception as e:
-                    self.logger.warning(
-                        f"ApiPipe error or quota limit, retrying in {backoff}s (attempt {attempt + 1}/{retries}): {str(e)}"
-                    )
-                    time.sleep(backoff)
-                    backoff *= 2
-            else:
-                self.logger.error("Max retries reached for ApiPipe. Marking as Not Relevant")
-                return {
-                    'category': settings.CATEGORY_NOT_RELEVANT,
-                    'confidence': 'Low',
-                    'reasoning': 'ApiPipe quota exceeded or errors',
-                    'web_search_summary': web_context
+        else:
+            items = [
+                {
+                    'keyword': entry['keyword'],
+                    'interest_score': entry.get('interest_score', 0),
+                    'related_queries': entry.get('related_queries', ''),
+                    'web_context': web_context
                 }
-            category = result.get('category', settings.CATEGORY_NOT_RELEVANT)
-            if category not in settings.VALID_CATEGORIES:
-                category = settings.CATEGORY_NOT_RELEVANT
-            return {
-                'category': category,
-                'confidence': result.get('confidence', 'Low'),
-                'reasoning': result.get('reasoning', 'No reasoning provided'),
-                'web_search_summary': web_context
-            }
-        except json.JSONDecodeError as e:
+                for entry, web_context in zip(entries, web_contexts)
+            ]
+            prompt = (BATCH_CATEGORIZATION_PROMPT_HEAD
+                      + orjson.dumps(items, option=orjson.OPT_INDENT_2).decode('utf-8')
+                      + BATCH_CATEGORIZATION_PROMPT_TAIL)
+        try:
+            async with self._sem:
+                response = await self.client.generate_text(prompt)
+            text_response = response.get("choices", [{}])[0].get("message", {}).get("content", "")
+            if not text_response:
+                text_response = response.get("text") or response.get("message") or ""
+            parsed = orjson.loads(text_response)
+        except orjson.JSONDecodeError as e:
+            if len(entries) > 1:
+                # A malformed or cut-short batch reply shouldn't sink the whole chunk
+                self.logger.warning(f"⚠️ Batch reply not valid JSON ({e}), retrying {len(entries)} keywords one by one")
+                return await self.categorize_individually(entries)
             self.logger.error(f"JSON parsing error: {e}")
-            return {
-                'category': settings.CATEGORY_NOT_RELEVANT,
-                'confidence': 'Low',
-                'reasoning': f'JSON error: {e}',
-                'web_search_summary': web_context
-            }
+            return [self.fallback_result(f'JSON error: {e}', web_context) for web_context in web_contexts]
         except Exception as e:
             self.logger.error(f"Unexpected error: {e}")
-            return {
-                'category': settings.CATEGORY_NOT_RELEVANT,
-                'confidence': 'Low',
-                'reasoning': f'Error: {e}',
-                'web_search_summary': web_context
-            }
-
-    def process_batch(self, data):
+            return [self.fallback_result(f'Error: {e}', web_context) for web_context in web_contexts]
+
+        if len(entries) == 1:
+            answers = [dict(parsed, keyword=entries[0]['keyword'])] if isinstance(parsed, dict) else []
+        elif isinstance(parsed, dict):
+            # Some models wrap the array in an object
+            answers = next((v for v in parsed.values() if isinstance(v, list)), [])
+        else:
+            answers = parsed
+        by_keyword = {
+            str(answer.get('keyword', '')).strip().lower(): answer
+            for answer in answers if isinstance(answer, dict)
+        }
+
+        results = [None] * len(entries)
+        missing = []
+        for i, (entry, web_context) in enumerate(zip(entries, web_contexts)):
+            answer = by_keyword.get(entry['keyword'].strip().lower())
+            if answer is None:
+                self.logger.warning(f"No classification returned for: {entry['keyword']}")
+                missing.append(i)
+                continue
+            ai_result = self.parse_result(answer, web_context)
+            # Only successful answers are cached; error fallbacks are retried next run
+            self._cache[self.cache_key(entry['keyword'])] = ai_result
+            results[i] = ai_result
+        self._cache.sync()
+        if missing and len(entries) > 1:
+            retried = await self.categorize_individually([entries[i] for i in missing])
+            for i, ai_result in zip(missing, retried):
+                results[i] = ai_result
+        else:
+            for i in missing:
+                results[i] = self.fallback_result('No classification returned', web_contexts[i])
+        return results
+
+    async def categorize_individually(self, entries):
+        """One request per entry, for keywords a batched reply failed to answer"""
+        retried = await asyncio.gather(*[self.categorize_with_llm([entry]) for entry in entries])
+        return [ai_results[0] for ai_results in retried]
+
+    async def process_batch(self, data):
         self.logger.info("🤖 Starting GPT-1 Agent categorization with web search...")
-        self.logger.info(f"📊 Processing {len(data)} entries")
+        self.logger.info(
+            f"📊 Processing {len(data)} entries "
+            f"({settings.APIPIPE_BATCH_SIZE} per request, {settings.APIPIPE_MAX_CONCURRENCY} concurrent)"
+        )
+        ai_results = await self.categorize_batch(data)
+        categorized_at = get_current_timestamp()
+        for entry, ai_result in zip(data, ai_results):
+            self.apply_result(entry, ai_result, categorized_at)
+        return data
+
+    def apply_result(self, entry, ai_result, categorized_at=None):
+        entry.update({
+            'category': ai_result['category'],
+            'ai_confidence': ai_result['confidence'],
+            'ai_reasoning': ai_result['reasoning'],
+            'web_search_summary': ai_result['web_search_summary'],
+            'categorized_at': categorized_at or get_current_timestamp(),
+            'status': settings.STATUS_PENDING
+        })
+        self.logger.info(f"✅ {entry['keyword']}: {ai_result['category']} (Confidence: {ai_result['confidence']})")
+
+    async def categorize_stream(self, queue, workers=settings.APIPIPE_MAX_CONCURRENCY):
+        """Categorize entries from the queue with N workers until each receives a None sentinel"""
+        self.logger.info(f"🤖 Categorizing keywords as they stream in ({workers} workers)")
         categorized_data = []
-        for i, entry in enumerate(data, 1):
-            self.logger.info(f"\n📝 Processing ({i}/{len(data)}): {entry['keyword']}")
-            ai_result = self.categorize_keyword(entry)
-            entry.update({
-                'category': ai_result['category'],
-                'ai_confidence': ai_result['confidence'],
-                'ai_reasoning': ai_result['reasoning'],
-                'web_search_summary': ai_result['web_search_summary'],
-                'categorized_at': get_current_timestamp(),
-                'status': settings.STATUS_PENDING
-            })
-            categorized_data.append(entry)
-            self.logger.info(f"✅ Category: {ai_result['category']} (Confidence: {ai_result['confidence']})")
-            add_delay('openai')
+        futures = {}
+
+        async def _worker():
+            done = False
+            while not done:
+                # Drain up to one request's worth of entries without waiting for more
+                batch = []
+                entry = await queue.get()
+                while entry is not None:
+                    batch.append(entry)
+                    if len(batch) == settings.APIPIPE_BATCH_SIZE or queue.empty():
+                        break
+                    entry = queue.get_nowait()
+                done = entry is None
+                # Reserve the slots first so output keeps extraction order
+                categorized_data.extend(batch)
+                fresh = {}
+                for item in batch:
+                    if item['keyword'] not in futures:
+                        futures[item['keyword']] = asyncio.get_running_loop().create_future()
+                        fresh[item['keyword']] = item
+                if fresh:
+                    ai_results = await self.categorize_batch(list(fresh.values()))
+                    for keyword, ai_result in zip(fresh, ai_results):
+                        futures[keyword].set_result(ai_result)
+                for item in batch:
+                    self.apply_result(item, await futures[item['keyword']])
+
+        await asyncio.gather(*[_worker() for _ in range(workers)])
         return categorized_data
 
+    async def categorize_unique(self, data):
+        unique = {}
+        for entry in data:
+            unique.setdefault(entry['keyword'], entry)
+        if len(unique) < len(data):
+            self.logger.info(f"🔁 Collapsed {len(data) - len(unique)} duplicate keywords")
+        results = await self.process_batch(list(unique.values()))
+        by_keyword = {r['keyword']: r for r in results}
+        return [
+            {**entry, **{k: by_keyword[entry['keyword']][k] for k in CATEGORIZATION_FIELDS}}
+            for entry in data
+        ]
+
     def run(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
         self.logger.info("🚀 Starting Phase 2: GPT-1 Agent Categorization")
         self.logger.info("=" * 60)
         try:
@@ -178,20 +402,30 @@ RESPONSE FORMAT (JSON only):
             if not data:
                 self.logger.error("❌ No data to process")
                 return False
-            categorized_data = self.process_batch(data)
-            if not categorized_data:
-                self.logger.error("❌ No data categorized")
-                return False
-            output_filename = 'phase2_categorized_data.csv'
-            filepath = save_data_to_csv(categorized_data, output_filename)
-            self.logger.info("\n✅ Phase 2 Complete!")
-            self.logger.info(f"🤖 Successfully categorized {len(categorized_data)} entries")
-            self.logger.info(f"💾 Results saved to: {filepath}")
-            self.logger.info("\n👉 Next: Review results and update status to 'Run GPT' for approved items")
-            return True
+            categorized_data = await self.categorize_unique(data)
+            return self.save_results(categorized_data)
         except Exception as e:
             self.logger.error(f"❌ Phase 2 failed: {e}")
             return False
+        finally:
+            await self.close()
+
+    def save_results(self, categorized_data):
+        if not categorized_data:
+            self.logger.error("❌ No data categorized")
+            return False
+        output_filename = 'phase2_categorized_data.csv'
+        filepath = save_data_to_csv(categorized_data, output_filename)
+        self.logger.info("\n✅ Phase 2 Complete!")
+        self.logger.info(f"🤖 Successfully categorized {len(categorized_data)} entries")
+        self.logger.info(f"💾 Results saved to: {filepath}")
+        self.logger.info("\n👉 Next: Review results and update status to 'Run GPT' for approved items")
+        return True
+
+    async def close(self):
+        await self.client.close()
+        if self._owns_cache:
+            self._cache.close()
 
 def main():
     config_errors = settings.validate_config()
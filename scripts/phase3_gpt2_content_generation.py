@@ -1,33 +1,25 @@
 import sys
 import os
-import json
-import time
-import requests
+import orjson
+import asyncio
+import aiohttp
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import settings
-from scripts.utils import setup_logging, load_data_from_csv, save_data_to_csv, save_json, get_current_timestamp, add_delay
+from scripts.apipipe_client import ApiPipeClient
+from scripts.openai_batch import OpenAIBatchClient
+from scripts.utils import setup_logging, load_data_from_csv, save_data_to_csv, get_current_timestamp
 
-class GPT2ContentGenerationAgent:
-    """GPT-2 Agent for generating multi-platform content with ApiPipe"""
-
-    def __init__(self):
-        self.logger = setup_logging(settings.LOG_LEVEL)
-        self.api_key = settings.APIPIPE_API_KEY
-        self.base_url = settings.APIPIPE_API_BASE_URL
-        if not self.api_key:
-            raise ValueError("ApiPipe API key is not set")
-        self.logger.info("✅ ApiPipe client initialized for content generation")
-
-    def get_content_prompts(self):
-        return {
-            'instagram_post': """Create an engaging Instagram post for job seekers in India.
+# Output of the last completed run, one JSON object per line
+GENERATED_CONTENT_FILE = os.path.join('output', 'generated_content.jsonl')
+# Items are appended here as they finish; only an interrupted run leaves it behind to resume from
+PARTIAL_CONTENT_FILE = os.path.join('output', 'generated_content.partial.jsonl')
 
-CONTENT DETAILS:
-Category: {category}
-Keyword: {keyword}
-Context: {reasoning}
+# Static instructions per content type. They go first and are never formatted, so
+# every request shares a byte-identical prefix that providers can cache
+_CONTENT_PROMPTS = {
+    'instagram_post': """Create an engaging Instagram post for job seekers in India.
 
 REQUIREMENTS:
 - Create attractive, informative caption (150-200 words)
@@ -38,18 +30,13 @@ REQUIREMENTS:
 - Use motivational and helpful tone
 
 RESPONSE FORMAT (JSON):
-{{
+{
     "caption": "Instagram caption with emojis and engaging content",
     "hashtags": "#hashtag1 #hashtag2 #hashtag3 #hashtag4 #hashtag5 #hashtag6 #hashtag7 #hashtag8 #hashtag9 #hashtag10 #hashtag11 #hashtag12 #hashtag13 #hashtag14 #hashtag15",
     "post_type": "Instagram Post"
-}}""",
+}""",
 
-            'blog_article': """Create a comprehensive blog article for job seekers.
-
-CONTENT DETAILS:
-Category: {category}
-Keyword: {keyword}
-Context: {reasoning}
+    'blog_article': """Create a comprehensive blog article for job seekers.
 
 REQUIREMENTS:
 - Write detailed article (400-500 words)
@@ -62,19 +49,14 @@ REQUIREMENTS:
 - Make it informative and helpful
 
 RESPONSE FORMAT (JSON):
-{{
+{
     "title": "SEO-optimized blog title with keyword",
     "content": "Full blog article with HTML subheadings <h2>, <h3> and proper formatting",
     "meta_description": "150-character SEO meta description",
     "homepage_link": "https://jobyaari.com"
-}}""",
+}""",
 
-            'youtube_reel': """Create a YouTube Reel script for job-related content.
-
-CONTENT DETAILS:
-Category: {category}
-Keyword: {keyword}
-Context: {reasoning}
+    'youtube_reel': """Create a YouTube Reel script for job-related content.
 
 REQUIREMENTS:
 - Create 30-60 second video script
@@ -85,19 +67,14 @@ REQUIREMENTS:
 - Include visual cues for video creation
 
 RESPONSE FORMAT (JSON):
-{{
+{
     "script": "Complete video script with timing cues [0-5s], [5-15s], etc.",
     "description": "YouTube description with keywords and engagement hooks",
     "hashtags": "#hashtag1 #hashtag2 #hashtag3 #hashtag4 #hashtag5 #hashtag6 #hashtag7 #hashtag8 #hashtag9 #hashtag10",
     "duration": "30-60 seconds"
-}}""",
-
-            'youtube_thumbnail': """Create YouTube thumbnail design specifications.
+}""",
 
-CONTENT DETAILS:
-Category: {category}
-Keyword: {keyword}
-Context: {reasoning}
+    'youtube_thumbnail': """Create YouTube thumbnail design specifications.
 
 REQUIREMENTS:
 - Describe visual elements and layout
@@ -108,101 +85,360 @@ REQUIREMENTS:
 - Ensure mobile readability
 
 RESPONSE FORMAT (JSON):
-{{
+{
     "design_description": "Detailed visual description of thumbnail layout and elements",
     "text_overlay": "Main text to display on thumbnail",
     "color_scheme": "Primary and secondary colors with hex codes",
     "style": "Design style and mood (professional, modern, bold, etc.)"
-}}"""
-        }
+}"""
+}
+
+# Per-keyword details, always sent after the static prefix
+CONTENT_DETAILS_SUFFIX = """CONTENT DETAILS:
+Category: {category}
+Keyword: {keyword}
+Context: {reasoning}"""
 
-    def generate_content_for_keyword(self, entry):
-        status = entry.get('status')
-        if status != settings.STATUS_RUN_GPT:
-            self.logger.info(f"⏭️ Skipping {entry['keyword']} - status: {status}")
-            return None
-        if entry.get('category') == settings.CATEGORY_NOT_RELEVANT:
-            self.logger.info(f"⏭️ Skipping {entry['keyword']} - Not Relevant")
-            return None
+# Batched variant of the suffix: K entries of one content type in a single request
+BATCH_DETAILS_HEAD = """Create this content separately for EACH item below.
 
-        self.logger.info(f"🎨 Generating content for: {entry['keyword']} ({entry.get('category')})")
-        prompts = self.get_content_prompts()
-        generated_content = {
+CONTENT ITEMS (JSON):
+"""
+
+BATCH_DETAILS_TAIL = """
+
+Return ONLY a JSON array with exactly one object per item, in the same order.
+Each object must contain the item's "id" plus every field from RESPONSE FORMAT."""
+
+
+# A batch of long-form replies (up to APIPIPE_BATCH_SIZE blog articles) is not streamed,
+# so the first byte can take minutes; the shared session's 30s read timeout is for Phase 2
+CONTENT_REQUEST_TIMEOUT = aiohttp.ClientTimeout(sock_connect=5, sock_read=300)
+
+# Replace drive:// with valid URLs for clickability (update base_url as needed)
+CONTENT_BASE_URL = "https://your-public-host.com/ai-content"
+
+# (column, file prefix, extension) for each generated content link
+LINK_SPECS = (
+    ('instagram_link', 'instagram', 'txt'),
+    ('blog_link', 'blog', 'html'),
+    ('youtube_reel_link', 'reel', 'txt'),
+    ('youtube_thumbnail_link', 'thumbnail', 'png'),
+)
+
+_SPACE_TO_UNDERSCORE = str.maketrans(' ', '_')
+
+def has_errors(item):
+    return any(isinstance(content, dict) and 'error' in content for content in item.values())
+
+def summarize_item(item):
+    """The few fields run_async needs once an item is on disk (one content_summary.csv row)"""
+    instagram = item.get('instagram_post', {})
+    blog = item.get('blog_article', {})
+    return {
+        'keyword': item['keyword'],
+        'category': item['category'],
+        'instagram_caption_preview': instagram.get('caption', '')[:100] + '...' if instagram.get('caption') else '',
+        'blog_title': blog.get('title', ''),
+        'generated_at': item.get('generated_at', ''),
+        'content_status': "Generated"
+    }
+
+def iter_generated_content(path=PARTIAL_CONTENT_FILE):
+    """Yield (raw line, item) from the JSONL file, skipping a line cut short by an interrupted run"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                yield line, orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+
+def load_generated_content(path=PARTIAL_CONTENT_FILE):
+    """Map keyword -> summary of its latest error-free item, {} if the file doesn't exist"""
+    summaries = {}
+    for _, item in iter_generated_content(path):
+        if has_errors(item):
+            summaries.pop(item['keyword'], None)
+        else:
+            summaries[item['keyword']] = summarize_item(item)
+    return summaries
+
+def open_generated_content(path=PARTIAL_CONTENT_FILE):
+    """Open the JSONL file for appending, terminating a line cut short by an interrupted run"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, 'ab')
+    if f.tell() > 0:
+        with open(path, 'rb') as existing:
+            existing.seek(-1, os.SEEK_END)
+            if existing.read(1) != b'\n':
+                f.write(b'\n')
+    return f
+
+def finalize_generated_content(keywords, path=GENERATED_CONTENT_FILE, partial_path=PARTIAL_CONTENT_FILE):
+    """Stream the completed run's latest line per keyword from the resume file into the output
+    file, then drop the resume file so the next run starts fresh"""
+    latest = {}
+    for index, (_, item) in enumerate(iter_generated_content(partial_path)):
+        if item['keyword'] in keywords:
+            latest[item['keyword']] = index
+    keep = set(latest.values())
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        for index, (line, _) in enumerate(iter_generated_content(partial_path)):
+            if index in keep:
+                out.write(line if line.endswith(b'\n') else line + b'\n')
+    os.replace(tmp_path, path)
+    os.remove(partial_path)
+    return path
+
+class GPT2ContentGenerationAgent:
+    """GPT-2 Agent for generating multi-platform content with ApiPipe"""
+
+    def __init__(self, http=None, use_batch_api=False, regenerate=False):
+        self.logger = setup_logging(settings.LOG_LEVEL)
+        self.http = http
+        # Batch API mode trades up to 24h latency for half-price tokens (nightly runs)
+        self.use_batch_api = use_batch_api
+        # Ignore what an interrupted earlier run left behind
+        self.regenerate = regenerate
+        self.api_key = settings.APIPIPE_API_KEY
+        if not self.api_key:
+            raise ValueError("ApiPipe API key is not set")
+        self.client = ApiPipeClient(self.api_key, session=http)
+        self.logger.info("✅ ApiPipe client initialized for content generation")
+
+    def get_content_prompts(self):
+        return _CONTENT_PROMPTS
+
+    def build_details(self, entry):
+        return CONTENT_DETAILS_SUFFIX.format(
+            category=entry.get('category', ''),
+            keyword=entry['keyword'],
+            reasoning=entry.get('ai_reasoning', '')
+        )
+
+    def build_batch_details(self, entries):
+        items = [
+            {
+                'id': i,
+                'category': entry.get('category', ''),
+                'keyword': entry['keyword'],
+                'reasoning': entry.get('ai_reasoning', '')
+            }
+            for i, entry in enumerate(entries)
+        ]
+        return BATCH_DETAILS_HEAD + orjson.dumps(items, option=orjson.OPT_INDENT_2).decode('utf-8') + BATCH_DETAILS_TAIL
+
+    def build_prompt(self, static_prefix, entry):
+        return f"{static_prefix}\n\n{self.build_details(entry)}"
+
+    def build_messages(self, static_prefix, details):
+        # cache_control marks the static block for Anthropic-style prompt caching;
+        # OpenAI models cache the identical leading block automatically
+        return [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": static_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": details}
+            ]
+        }]
+
+    def parse_completion(self, content_json):
+        content_str = content_json.get("choices", [{}])[0].get("message", {}).get("content", "")
+        return orjson.loads(content_str)
+
+    def select_approved(self, data):
+        """Entries approved for content generation ('Run GPT' and not Not Relevant)"""
+        approved = []
+        for entry in data:
+            if entry.get('status') != settings.STATUS_RUN_GPT:
+                continue
+            if entry.get('category') == settings.CATEGORY_NOT_RELEVANT:
+                self.logger.info(f"⏭️ Skipping {entry['keyword']} - Not Relevant")
+                continue
+            approved.append(entry)
+        if not approved:
+            self.logger.warning("⚠️ No approved entries found (status = 'Run GPT')")
+        return approved
+
+    def new_item(self, entry, generated_at):
+        return {
             'keyword': entry['keyword'],
             'category': entry.get('category'),
             'interest_score': entry.get('interest_score'),
-            'generated_at': get_current_timestamp()
+            'generated_at': generated_at
         }
 
-        for content_type, prompt_template in prompts.items():
-            prompt = prompt_template.format(
-                category=entry.get('category', ''),
-                keyword=entry['keyword'],
-                reasoning=entry.get('ai_reasoning', '')
+    def split_resumed(self, approved):
+        """Separate entries an interrupted run already generated without errors from those still to do"""
+        done = load_generated_content()
+        pending, resumed = [], []
+        for entry in approved:
+            summary = done.get(entry['keyword'])
+            # A re-categorized keyword needs new content
+            if summary is not None and summary['category'] == entry.get('category'):
+                resumed.append(summary)
+            else:
+                pending.append(entry)
+        if resumed:
+            self.logger.info(
+                f"⏭️ Resuming: reusing {len(resumed)} entries from {PARTIAL_CONTENT_FILE} (--regenerate to redo)"
             )
-            try:
-                response = requests.post(
-                    self.base_url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "openai/gpt-4.1-nano",
-                        "messages": [{"role": "user", "content": prompt}]
-                    }
-                )
-                response.raise_for_status()
-                content_json = response.json()
-                content_str = content_json.get("choices", [{}])[0].get("message", {}).get("content", "")
-                parsed_content = json.loads(content_str)
-                generated_content[content_type] = parsed_content
-                self.logger.info(f"✅ Generated {content_type}")
-                add_delay('openai')
-            except Exception as e:
-                self.logger.error(f"❌ Error generating {content_type}: {str(e)}")
-                generated_content[content_type] = {"error": str(e)}
-
-        return generated_content
-
-    def process_approved_entries(self, data):
-        approved = [e for e in data if e.get('status') == settings.STATUS_RUN_GPT]
+        return pending, resumed
+
+    def write_generated(self, f, items):
+        f.write(b''.join(orjson.dumps(item) + b'\n' for item in items))
+        f.flush()
+
+    async def generate_single(self, content_type, static_prefix, entry):
+        try:
+            content_json = await self.client.generate_text(
+                messages=self.build_messages(static_prefix, self.build_details(entry)),
+                timeout=CONTENT_REQUEST_TIMEOUT
+            )
+            parsed_content = self.parse_completion(content_json)
+            self.logger.info(f"✅ Generated {content_type} for {entry['keyword']}")
+            return parsed_content
+        except Exception as e:
+            self.logger.error(f"❌ Error generating {content_type} for {entry['keyword']}: {str(e)}")
+            return {"error": str(e)}
+
+    async def generate_batch(self, content_type, static_prefix, entries):
+        """Generate one content type for several entries in one request, falling back to one request each"""
+        if len(entries) == 1:
+            return [await self.generate_single(content_type, static_prefix, entries[0])]
+        try:
+            content_json = await self.client.generate_text(
+                messages=self.build_messages(static_prefix, self.build_batch_details(entries)),
+                timeout=CONTENT_REQUEST_TIMEOUT
+            )
+            parsed = self.parse_completion(content_json)
+            if isinstance(parsed, dict):
+                # Some models wrap the array in an object
+                parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+            by_id = {str(answer.get('id')): answer for answer in parsed if isinstance(answer, dict)}
+            if len(parsed) != len(entries) or any(str(i) not in by_id for i in range(len(entries))):
+                raise ValueError(f"expected {len(entries)} items, got {len(parsed)}")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Batched {content_type} failed ({e}), retrying {len(entries)} entries one by one")
+            return await asyncio.gather(
+                *[self.generate_single(content_type, static_prefix, entry) for entry in entries]
+            )
+        self.logger.info(f"✅ Generated {content_type} for {len(entries)} entries")
+        return [
+            {k: v for k, v in by_id[str(i)].items() if k != 'id'}
+            for i in range(len(entries))
+        ]
+
+    async def process_approved_entries(self, data, max_concurrency=settings.APIPIPE_MAX_CONCURRENCY):
+        approved = self.select_approved(data)
+        if not approved:
+            return []
+
+        approved, resumed = self.split_resumed(approved)
+        if not approved:
+            return resumed
+
+        size = settings.APIPIPE_BATCH_SIZE
+        prompts = self.get_content_prompts()
+        self.logger.info(
+            f"📊 Processing {len(approved)} approved entries for content generation "
+            f"({size} per request, {max_concurrency} concurrent)"
+        )
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _one(content_type, chunk):
+            async with sem:
+                return await self.generate_batch(content_type, prompts[content_type], chunk)
+
+        async def _chunk(f, chunk):
+            # One request per (content type, chunk of entries) instead of per (content type, entry)
+            results = await asyncio.gather(*[_one(content_type, chunk) for content_type in prompts])
+            generated_at = get_current_timestamp()
+            items = [self.new_item(entry, generated_at) for entry in chunk]
+            for content_type, chunk_contents in zip(prompts, results):
+                for item, content in zip(items, chunk_contents):
+                    item[content_type] = content
+            self.write_generated(f, items)
+            # The full content is on disk now; keep only what run_async needs
+            return [summarize_item(item) for item in items]
+
+        with open_generated_content() as f:
+            chunks = await asyncio.gather(
+                *[_chunk(f, approved[start:start + size]) for start in range(0, len(approved), size)]
+            )
+        return resumed + [summary for summaries in chunks for summary in summaries]
+
+    async def process_approved_entries_batch(self, data):
+        """Generate all content through the OpenAI Batch API: one upload, one poll loop, one download"""
+        approved = self.select_approved(data)
         if not approved:
-            self.logger.warning("⚠️ No approved entries found (status = 'Run GPT')")
             return []
+        approved, resumed = self.split_resumed(approved)
+        if not approved:
+            return resumed
 
-        self.logger.info(f"📊 Processing {len(approved)} approved entries for content generation")
-        results = []
-        for i, entry in enumerate(approved, 1):
-            self.logger.info(f"\n🎯 Processing ({i}/{len(approved)}): {entry['keyword']}")
-            content = self.generate_content_for_keyword(entry)
-            if content:
-                results.append(content)
-        return results
+        prompts = self.get_content_prompts()
+        # custom_id uses the entry index so keywords containing '|' map back safely
+        requests = [
+            OpenAIBatchClient.build_request(f"{i}|{content_type}", self.build_prompt(static_prefix, entry))
+            for i, entry in enumerate(approved)
+            for content_type, static_prefix in prompts.items()
+        ]
+        self.logger.info(f"📦 Sending {len(requests)} requests for {len(approved)} entries to the OpenAI Batch API")
+        batch_client = OpenAIBatchClient(settings.OPENAI_API_KEY, session=self.http)
+        try:
+            results = await batch_client.run(requests)
+        finally:
+            await batch_client.close()
+
+        generated_at = get_current_timestamp()
+        contents = []
+        for i, entry in enumerate(approved):
+            generated_content = self.new_item(entry, generated_at)
+            for content_type in prompts:
+                body = results.get(f"{i}|{content_type}", {"error": "No result returned"})
+                try:
+                    if 'error' in body:
+                        raise RuntimeError(body['error'])
+                    generated_content[content_type] = self.parse_completion(body)
+                except Exception as e:
+                    self.logger.error(f"❌ Error generating {content_type} for {entry['keyword']}: {str(e)}")
+                    generated_content[content_type] = {"error": str(e)}
+            contents.append(generated_content)
+
+        with open_generated_content() as f:
+            self.write_generated(f, contents)
+        return resumed + [summarize_item(item) for item in contents]
 
     def update_original_data_with_content_links(self, original_data, generated_content):
-        content_map = {item['keyword']: item for item in generated_content}
+        # Only membership is needed, so a set of keywords suffices
+        content_keys = {item['keyword'] for item in generated_content}
+        # Second-resolution stamp; one call covers the whole pass
+        content_generated_at = get_current_timestamp()
         updated = []
         for entry in original_data:
             key = entry['keyword']
-            if key in content_map:
+            if key in content_keys:
                 # Mark Not Relevant entries explicitly
                 if entry.get('category') == settings.CATEGORY_NOT_RELEVANT:
                     entry['status'] = 'Not Relevant'
                 else:
                     entry['status'] = 'Content Generated'
-                entry['content_generated_at'] = get_current_timestamp()
-                # Replace drive:// with valid URLs for clickability (update base_url as needed)
-                base_url = "https://your-public-host.com/ai-content"
-                entry['instagram_link'] = f"{base_url}/instagram_{key.replace(' ', '_')}.txt"
-                entry['blog_link'] = f"{base_url}/blog_{key.replace(' ', '_')}.html"
-                entry['youtube_reel_link'] = f"{base_url}/reel_{key.replace(' ', '_')}.txt"
-                entry['youtube_thumbnail_link'] = f"{base_url}/thumbnail_{key.replace(' ', '_')}.png"
+                entry['content_generated_at'] = content_generated_at
+                slug = key.translate(_SPACE_TO_UNDERSCORE)
+                for field, prefix, ext in LINK_SPECS:
+                    entry[field] = f"{CONTENT_BASE_URL}/{prefix}_{slug}.{ext}"
                 self.logger.info(f"📋 Updated {key} with content links")
             updated.append(entry)
         return updated
 
     def run(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
         self.logger.info("🚀 Starting Phase 3: GPT-2 Content Generation")
         self.logger.info("=" * 60)
 
@@ -210,39 +446,34 @@ RESPONSE FORMAT (JSON):
             data = load_data_from_csv('phase2_approved.csv')
             self.logger.info(f"📊 Loaded {len(data)} entries from phase2_approved.csv")
 
-            generated_content = self.process_approved_entries(data)
-            if not generated_content:
+            if self.regenerate and os.path.exists(PARTIAL_CONTENT_FILE):
+                os.remove(PARTIAL_CONTENT_FILE)
+
+            # Full items are streamed to disk; these are one content_summary.csv row per entry
+            if self.use_batch_api:
+                summary = await self.process_approved_entries_batch(data)
+            else:
+                summary = await self.process_approved_entries(data)
+            if not summary:
                 self.logger.warning("⚠️ No content generated, please check 'Run GPT' status entries")
                 return False
 
-            save_json(generated_content, 'generated_content.json')
-
-            summary = []
-            for item in generated_content:
-                instagram = item.get('instagram_post', {})
-                blog = item.get('blog_article', {})
-                summary.append({
-                    'keyword': item['keyword'],
-                    'category': item['category'],
-                    'instagram_caption_preview': instagram.get('caption', '')[:100] + '...' if instagram.get('caption') else '',
-                    'blog_title': blog.get('title', ''),
-                    'generated_at': item.get('generated_at', ''),
-                    'content_status': "Generated"
-                })
-
+            finalize_generated_content({row['keyword'] for row in summary})
             save_data_to_csv(summary, 'content_summary.csv', 'output')
 
-            updated_data = self.update_original_data_with_content_links(data, generated_content)
+            updated_data = self.update_original_data_with_content_links(data, summary)
             save_data_to_csv(updated_data, 'updated_trends_data.csv')
 
             self.logger.info("\n✅ Phase 3 Completed Successfully")
-            self.logger.info(f"Generated content for {len(generated_content)} entries")
-            self.logger.info("Saved generated content to JSON and CSV summary files")
+            self.logger.info(f"Generated content for {len(summary)} entries")
+            self.logger.info(f"Saved generated content to {GENERATED_CONTENT_FILE} and CSV summary files")
 
             return True
         except Exception as e:
             self.logger.error(f"❌ Phase 3 Failed: {str(e)}")
             return False
+        finally:
+            await self.client.close()
 
 
 def main():
@@ -5,13 +5,47 @@ Integrate with Google Sheets for workflow management and content tracking
 
 import sys
 import os
+import orjson
 import gspread
+from gspread.utils import absolute_range_name
 from google.oauth2.service_account import Credentials
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.settings import settings
 from scripts.utils import setup_logging, load_data_from_csv
 
+def is_transient_sheets_error(error):
+    """Sheets API rate limits (429) and server errors (5xx) are worth retrying"""
+    if isinstance(error, gspread.exceptions.APIError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+# Exponential backoff with jitter for Sheets API calls, which are rate limited per minute
+sheets_retry = retry(
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception(is_transient_sheets_error),
+    reraise=True
+)
+
+# Keep each values.batchUpdate body comfortably under the Sheets API request size limit
+SHEETS_MAX_REQUEST_BYTES = 5 * 1024 * 1024
+
+def chunk_rows_by_size(rows, max_bytes=SHEETS_MAX_REQUEST_BYTES):
+    """Split rows into consecutive chunks whose JSON encoding stays under max_bytes"""
+    chunk, size = [], 0
+    for row in rows:
+        row_size = len(orjson.dumps(row))
+        if chunk and size + row_size > max_bytes:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
 class GoogleSheetsIntegration:
     def __init__(self):
         self.logger = setup_logging(settings.LOG_LEVEL)
@@ -63,9 +97,7 @@ class GoogleSheetsIntegration:
                     cols=len(settings.SHEET_HEADERS)
                 )
                 self.logger.info(f"  ➕ Created new worksheet: {worksheet_name}")
-            worksheet.clear()
-            worksheet.insert_row(settings.SHEET_HEADERS, 1)
-            self.logger.info(f"  ✅ Updated headers for {worksheet_name}")
+            # Headers are written together with the data in upload_data_to_sheet
             return worksheet
         except Exception as e:
             self.logger.error(f"  ❌ Error setting up {worksheet_name}: {str(e)}")
@@ -84,17 +116,21 @@ class GoogleSheetsIntegration:
             if not data:
                 self.logger.warning("⚠️ No data to upload")
                 return False
-            upload_data = []
-            for entry in data:
-                row = []
-                for header in settings.SHEET_HEADERS:
-                    h = header.lower().replace(' ', '_')
-                    row.append(str(entry.get(h, '')))
-                upload_data.append(row)
+            # Sheet headers map to CSV columns, e.g. "Instagram Link" -> instagram_link
+            keys = [header.lower().replace(' ', '_') for header in settings.SHEET_HEADERS]
+            upload_data = [[str(entry.get(key, '')) for key in keys] for entry in data]
             if upload_data:
-                worksheet.batch_clear(["A2:Z1000"])
-                worksheet.update(f"A2:Z{len(upload_data)+1}", upload_data)
-                self.logger.info(f"  ✅ Uploaded {len(upload_data)} entries")
+                sheets_retry(worksheet.clear)()
+                # Header and rows go out as one RAW values.batchUpdate per size-bounded chunk
+                rows = [list(settings.SHEET_HEADERS)] + upload_data
+                start_row = 1
+                for chunk in chunk_rows_by_size(rows):
+                    sheets_retry(worksheet.spreadsheet.values_batch_update)(body={
+                        "valueInputOption": "RAW",
+                        "data": [{"range": absolute_range_name(worksheet.title, f"A{start_row}"), "values": chunk}]
+                    })
+                    start_row += len(chunk)
+                self.logger.info(f"  ✅ Uploaded headers and {len(upload_data)} entries")
                 return True
             return False
         except Exception as e:
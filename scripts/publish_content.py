@@ -1,18 +1,26 @@
 import sys
 import os
+import asyncio
 import gspread
 from google.oauth2.service_account import Credentials
 from config.settings import settings
 from scripts.utils import setup_logging
+from scripts.phase4_sheets_integration import sheets_retry
 
-def mock_publish_instagram(caption, hashtags, doc_link):
+# Rows published at once; each row fans out to one call per platform
+PUBLISH_MAX_CONCURRENCY = 10
+
+async def mock_publish_instagram(caption, hashtags, doc_link):
     print(f"[Mock Instagram] Caption preview: {caption[:30]}... Link: {doc_link}")
+    return 'instagram', True
 
-def mock_publish_blog(title, content, links):
+async def mock_publish_blog(title, content, links):
     print(f"[Mock Blog] Title: {title} Links: {', '.join(links)}")
+    return 'blog', True
 
-def mock_publish_youtube(script, thumbnail):
+async def mock_publish_youtube(script, thumbnail):
     print(f"[Mock YouTube] Script preview: {script[:30]}... Thumbnail: {thumbnail}")
+    return 'youtube', True
 
 class Publisher:
     def __init__(self):
@@ -36,16 +44,45 @@ class Publisher:
     def get_rows(self, worksheet):
         return worksheet.get_all_records()
 
-    def update_status(self, worksheet, row_num, status):
-        worksheet.update(f'D{row_num}', status)  # Assuming Status in D column
+    def status_update(self, row_num, status):
+        return {"range": f"D{row_num}", "values": [[status]]}  # Assuming Status in D column
+
+    def update_statuses(self, worksheet, updates):
+        # One request for all rows; rewriting the same values is safe if it is retried
+        sheets_retry(worksheet.batch_update)(updates, value_input_option='RAW')
+
+    async def publish_row(self, row):
+        """Publish one row to every platform concurrently; True only if all succeed"""
+        keyword = row.get('Keyword')
+        results = await asyncio.gather(
+            mock_publish_instagram("Sample caption with #hashtag", "#hashtag", row.get('Instagram Link')),
+            mock_publish_blog(keyword, "Sample content with links", [row.get('Blog Link')]),
+            mock_publish_youtube("Sample reel script", row.get('Youtube Thumbnail Link')),
+            return_exceptions=True
+        )
+        failed = []
+        for result in results:
+            if isinstance(result, Exception):
+                failed.append(str(result))
+            elif not result[1]:
+                failed.append(result[0])
+        if failed:
+            self.logger.error(f"Publishing failed for '{keyword}': {', '.join(failed)}")
+            return False
+        self.logger.info(f"Published content for '{keyword}'.")
+        return True
 
     def run(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
         worksheet = self.open_sheet()
         if not worksheet:
             self.logger.error("Could not access worksheet.")
             return False
         
         rows = self.get_rows(worksheet)
+        pending = []
         for idx, row in enumerate(rows, start=2):  # Data starts after header row 1
             status = row.get('Status')
             approval = row.get('Approval')
@@ -56,15 +93,21 @@ class Publisher:
             if status == 'Published':
                 self.logger.info(f"Already published '{keyword}'. Skipping.")
                 continue
+            pending.append((idx, row))
+
+        sem = asyncio.Semaphore(PUBLISH_MAX_CONCURRENCY)
+
+        async def _one(row):
+            async with sem:
+                return await self.publish_row(row)
 
-            # Mock publish calls
-            mock_publish_instagram("Sample caption with #hashtag", "#hashtag", row.get('Instagram Link'))
-            mock_publish_blog(keyword, "Sample content with links", [row.get('Blog Link')])
-            mock_publish_youtube("Sample reel script", row.get('Youtube Thumbnail Link'))
+        published = await asyncio.gather(*[_one(row) for _, row in pending])
 
-            # Update status in sheet after 'publishing'
-            self.update_status(worksheet, idx, "Published")
-            self.logger.info(f"Published content for '{keyword}'.")
+        # Status is written for all published rows once every row has finished
+        updates = [self.status_update(idx, "Published") for (idx, _), ok in zip(pending, published) if ok]
+        if updates:
+            self.update_statuses(worksheet, updates)
+            self.logger.info(f"Marked {len(updates)} rows as Published.")
 
         self.logger.info("Publishing run complete.")
         return True
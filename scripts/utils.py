@@ -1,19 +1,20 @@
 import os
-import json
+import csv
 import logging
-import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Iterator
 import colorlog
-import time
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
-    """Setup colored logging with file and console output"""
-    os.makedirs('logs', exist_ok=True)
-    
+    """Setup colored logging with file and console output (handlers are added once per process)"""
     logger = logging.getLogger('ai_automation')
     logger.setLevel(getattr(logging, log_level.upper()))
-    logger.handlers.clear()
+    if logger.handlers:
+        return logger
+    # Our own handlers do the output; don't repeat records through the root logger
+    logger.propagate = False
+    
+    os.makedirs('logs', exist_ok=True)
     
     # Console handler with colors
     console_handler = colorlog.StreamHandler()
@@ -41,75 +42,56 @@ def setup_logging(log_level: str = "INFO") -> logging.Logger:
     return logger
 
 def save_data_to_csv(data: List[Dict], filename: str, directory: str = 'data') -> str:
-    """Save data to CSV file"""
+    """Save data to CSV file, with columns in order of first appearance"""
     os.makedirs(directory, exist_ok=True)
     filepath = os.path.join(directory, filename)
     
-    df = pd.DataFrame(data)
-    df.to_csv(filepath, index=False, encoding='utf-8')
+    fieldnames = list(dict.fromkeys(key for row in data for key in row))
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+        writer.writeheader()
+        writer.writerows(data)
     
     return filepath
 
 def load_data_from_csv(filename: str, directory: str = 'data') -> List[Dict]:
-    """Load data from CSV file"""
-    filepath = os.path.join(directory, filename)
-    
-    if not os.path.exists(filepath):
-        raise FileNotFoundError(f"File not found: {filepath}")
-    
-    df = pd.read_csv(filepath, encoding='utf-8')
-    df = df.fillna('')  # Replace NaN with empty strings
-    
-    return df.to_dict('records')
+    """Load data from CSV file; all values are strings, empty cells are ''"""
+    return [row for chunk in iter_data_from_csv(filename, directory) for row in chunk]
 
-def save_json(data: Any, filename: str, directory: str = 'output') -> str:
-    """Save data to JSON file"""
-    os.makedirs(directory, exist_ok=True)
-    filepath = os.path.join(directory, filename)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    return filepath
-
-def load_json(filename: str, directory: str = 'output') -> Any:
-    """Load data from JSON file"""
+def iter_data_from_csv(filename: str, directory: str = 'data', chunksize: int = 4096) -> Iterator[List[Dict]]:
+    """Yield CSV rows in lists of up to chunksize, for files too large to hold in memory"""
     filepath = os.path.join(directory, filename)
     
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            # Short rows come back as None; match the old fillna('') behaviour
+            chunk.append({key: value or '' for key, value in row.items() if key is not None})
+            if len(chunk) == chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
 def clean_text(text: str) -> str:
     """Clean and normalize text"""
-    if not text or pd.isna(text):
+    # NaN is the only value not equal to itself
+    if not text or (isinstance(text, float) and text != text):
         return ""
     
-    text = str(text)
-    text = ' '.join(text.split())
-    text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    
-    return text.strip()
+    # split() already breaks on \n, \r and \t and drops leading/trailing whitespace
+    return ' '.join(str(text).split())
 
 def get_current_timestamp() -> str:
     """Get current timestamp"""
     return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-def add_delay(delay_type: str = 'default'):
-    """Add delay to avoid rate limiting"""
-    delays = {
-        'openai': 1,
-        'google_trends': 2,
-        'google_sheets': 0.5,
-        'default': 1
-    }
-    
-    time.sleep(delays.get(delay_type, 1))
-
 def create_sample_data() -> List[Dict]:
     """Create sample data for testing"""
+    now = get_current_timestamp()
     return [
         {
             'keyword': 'ssc cgl admit card 2024',
@@ -122,8 +104,8 @@ def create_sample_data() -> List[Dict]:
             'web_search_summary': 'SSC CGL admit card trending',
             'related_queries': 'ssc.nic.in, admit card download',
             'top_regions': 'Delhi, Maharashtra, UP',
-            'date_extracted': get_current_timestamp(),
-            'categorized_at': get_current_timestamp(),
+            'date_extracted': now,
+            'categorized_at': now,
             'instagram_link': '',
             'blog_link': '',
             'youtube_reel_link': '',
@@ -141,8 +123,8 @@ def create_sample_data() -> List[Dict]:
             'web_search_summary': 'NEET UG result declared with merit list',
             'related_queries': 'nta.ac.in, neet scorecard, merit list',
             'top_regions': 'Tamil Nadu, Karnataka, AP',
-            'date_extracted': get_current_timestamp(),
-            'categorized_at': get_current_timestamp(),
+            'date_extracted': now,
+            'categorized_at': now,
             'instagram_link': '',
             'blog_link': '',
             'youtube_reel_link': '',